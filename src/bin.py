@@ -5,9 +5,11 @@ __status__  = "Production"
 
 
 import math
+from collections import defaultdict
 from enum import Enum
-from typing import List
-from rect import Rect  
+from operator import attrgetter
+from typing import List, Optional
+from rect import Rect, INT_MAX  
 
 
 class PackingHeuristic(Enum):
@@ -36,7 +38,10 @@ class Bin:
     maxspace.MaxSpaceBin : A class that inherits from this class
     """    
     
-    def __init__(self, binWidth: int, binHeight: int):
+    __slots__ = ('binWidth', 'binHeight', 'occupiedArea', 'touchingPerimeter', 'packedRects', 'freeRects', 
+                 'canRotate', 'leftEdges', 'rightEdges', 'bottomEdges', 'topEdges', 'packHeur')
+    
+    def __init__(self, binWidth: int, binHeight: int) -> None:
         self.binWidth = binWidth
         self.binHeight = binHeight
         self.occupiedArea = 0
@@ -44,10 +49,15 @@ class Bin:
         self.packedRects = []
         self.freeRects = []
         self.canRotate = False
+        #packed rects indexed by the coordinate of each of their edges
+        self.leftEdges = {}
+        self.rightEdges = {}
+        self.bottomEdges = {}
+        self.topEdges = {}
         self.packHeur = None 
           
     
-    def setupFreeRects(self):
+    def setupFreeRects(self) -> None:
         """Sets up the free spaces inside the bin. This method should be overriden in the descendent classes.
 
         See Also
@@ -56,19 +66,46 @@ class Bin:
         """
         raise NotImplementedError("Not implemented yet")
 
+
+    def indexFreeRects(self) -> None:
+        """Update the bookkeeping derived from the free spaces. It should be invoked whenever the free 
+        spaces change. This method does nothing unless overriden in the descendent classes.
+
+        See Also
+        --------
+        maxspace.MaxSpaceBin.indexFreeRects : a method that overrides this method
+        """
+        pass
+
+
+
+    def prune(self) -> None:
+        """Complete the clean-up of the free spaces deferred by insertions with ``prune=False``. This method 
+        does nothing unless overriden in the descendent classes.
+
+        See Also
+        --------
+        maxspace.MaxSpaceBin.prune : a method that overrides this method
+        """
+        pass
+
                     
-    def init(self):
+    def init(self) -> None:
         self.setup()
     
                     
-    def setup(self):
+    def setup(self) -> None:
         self.packedRects = []
+        self.leftEdges = {}
+        self.rightEdges = {}
+        self.bottomEdges = {}
+        self.topEdges = {}
         self.setupFreeRects()
         self.occupiedArea = 0
         self.touchingPerimeter = 0
 
     
-    def evaluatePacking(self, rect, heur: PackingHeuristic):
+    def evaluatePacking(self, rect: Rect, heur: PackingHeuristic) -> Optional[Rect]:
         """Evaluate the quality of packing an item using the specified packing heuristic.
         
         This method must be overriden in the descendant classes.
@@ -87,8 +124,21 @@ class Bin:
         """
         raise NotImplementedError("Not implemented yet")
 
+
+    def getBestPossibleScore(self, rect: Rect, heur: PackingHeuristic) -> int:
+        """Get a lower bound on the ``score1`` that evaluatePacking can return for an item.
+
+        A packing reaching this bound cannot be improved upon in any other bin. This method returns 
+        ``-INT_MAX`` (no bound) unless overriden in the descendent classes.
+
+        See Also
+        --------
+        maxspace.MaxSpaceBin.getBestPossibleScore : a method that overrides this method
+        """
+        return -INT_MAX
+
     
-    def insert(self, rect, heuristic: PackingHeuristic):
+    def insert(self, rect: Rect, heuristic: PackingHeuristic, prune: bool = True) -> bool:
         """Insert an item in this bin using the specified packing heuristic to determine its location
         inside the bin. 
 
@@ -105,6 +155,8 @@ class Bin:
             The item
         heur : PackingHeuristic
             The packing heuristic
+        prune : bool
+            Whether to update the free spaces fully right away (True) or to leave the clean-up for later (False)
 
         Returns
         -------
@@ -114,41 +166,74 @@ class Bin:
         raise NotImplementedError("Not implemented yet")
 
 
-    def mergeFreeRects(self):
-        """Merge free spaces (rects) inside the bin to get more spaces for further packing."""
-        for i in range(len(self.freeRects)):
-            rectI = freeRects[i]
-            for j in range(i+1, len(self.freeRects)):
-                rectJ = freeRects[j]
-                #Check if two rects extend vertically
-                if(rectI.x == rectJ.x and rectI.width == rectJ.width):
-                    if(rectI.y == rectJ.y + rectJ.height):
-                        rectI.y -= rectJ.height
-                        rectI.height += rectJ.height
-                        freeRects.remove(j)
-                        --j
-
-                    elif(rectI.y + rectI.height == rectJ.y):
-                        rectI.height += rectJ.height
-                        freeRects.remove(j)
-                        --j
-                                    
-                #Check if two rects extend horizontally
-                elif(rectI.y == rectJ.y and rectI.height == rectJ.height):
-                    #rectI to the right of rectJ
-                    if(rectI.x == rectJ.x + rectJ.width):
-                        rectI.x -= rectJ.width
-                        rectI.width += rectJ.width
-                        freeRects.remove(j)
-                        --j
-                    
-                    #rectI to the left of rectJ
-                    elif(rectI.x + rectI.width == rectJ.x):
-                        rectI.width += rectJ.width
-                        freeRects.remove(j)
-                        --j
+    def insertBatch(self, rects: List[Rect], heuristic: PackingHeuristic) -> List[Rect]:
+        """Insert several items in this bin using the specified packing heuristic.
+
+        The items are inserted in a descending order of their longest side (then of their area), so that 
+        the large items are placed while the bin has few and large free spaces.
+
+        Parameters
+        ----------
+        rects : List[rect.Rect]
+            The items
+        heuristic : PackingHeuristic
+            The packing heuristic
+
+        Returns
+        -------
+        List[rect.Rect]
+            The items that could not be inserted in this bin, in the order they were tried.
+        """
+        notInserted = []
+        for rect in sorted(rects, key=lambda r: (max(r.width, r.height), r.area), reverse=True):
+            #make sure the item is evaluated against this bin rather than packed at a stale position
+            rect.removePackingInfo()
+            if not self.insert(rect, heuristic):
+                notInserted.append(rect)
+        return notInserted
+
+
+    def mergeFreeRects(self) -> None:
+        """Merge free spaces (rects) inside the bin to get more spaces for further packing.
+
+        Free spaces in the same column (same x and width) that touch or overlap vertically are merged 
+        first. Then, free spaces in the same row (same y and height) that touch or overlap horizontally 
+        are merged. Each group is sorted and swept once so merging costs O(n log n).
+        """
+        absorbed = set()
+        #Merge vertically
+        columns = defaultdict(list)
+        for rect in self.freeRects:
+            columns[(rect.x, rect.width)].append(rect)
+        for column in columns.values():
+            column.sort(key=attrgetter('y'))
+            prev = column[0]
+            for rect in column[1:]:
+                if rect.y <= prev.y2:
+                    if rect.y2 > prev.y2: prev.resize(prev.width, rect.y2 - prev.y)
+                    absorbed.add(id(rect))
+                else:
+                    prev = rect
+        freeRects = [rect for rect in self.freeRects if id(rect) not in absorbed]
+
+        #Merge horizontally
+        rows = defaultdict(list)
+        for rect in freeRects:
+            rows[(rect.y, rect.height)].append(rect)
+        for row in rows.values():
+            row.sort(key=attrgetter('x'))
+            prev = row[0]
+            for rect in row[1:]:
+                if rect.x <= prev.x2:
+                    if rect.x2 > prev.x2: prev.resize(rect.x2 - prev.x, prev.height)
+                    absorbed.add(id(rect))
+                else:
+                    prev = rect
+        self.freeRects = [rect for rect in freeRects if id(rect) not in absorbed]
+        self.indexFreeRects()
+
                     
-    def packRect(self, rect):
+    def packRect(self, rect: Rect) -> None:
         """Pack a rect in this bin
 
         Parameters
@@ -158,20 +243,24 @@ class Bin:
         """
         self.packedRects.append(rect) 
         self.occupiedArea += rect.width * rect.height
+        self.leftEdges.setdefault(rect.x, []).append(rect)
+        self.rightEdges.setdefault(rect.x2, []).append(rect)
+        self.bottomEdges.setdefault(rect.y, []).append(rect)
+        self.topEdges.setdefault(rect.y2, []).append(rect)
     
 
-    def isEmpty(self):
+    def isEmpty(self) -> bool:
         """Check whether this bin is empty."""
         return len(self.packedRects) == 0
     
 
-    def isFeasible(self):
+    def isFeasible(self) -> bool:
         for i in range(len(self.packedRects)):
             rect1 = self.packedRects[i]
             #if rect1 partially or fully lies outside the bin
             if(rect1.x < 0 or rect1.x > self.binWidth): return False
             if(rect1.y < 0 or rect1.y > self.binHeight): return False
-            if(rect1.x + rect1.width > self.binWidth or rect1.y + rect1.height > self.binHeight):
+            if(rect1.x2 > self.binWidth or rect1.y2 > self.binHeight):
                 return False
             for j in range(i+1, len(self.packedRects)):
                 rect2 = self.packedRects[j]
@@ -181,22 +270,37 @@ class Bin:
         return True
     
     
-    def computeTouchingPerimeter(self, x, y, width, height):
+    def computeTouchingPerimeter(self, x: int, y: int, width: int, height: int) -> int:
+        """Compute the length of the perimeter of the rect ``(x, y, width, height)`` that touches
+        the bin borders or the packed items."""
+        x2 = x + width
+        y2 = y + height
         perimeter = 0
-        if(x == 0 or x + width == self.binWidth):
+        if(x == 0 or x2 == self.binWidth):
             perimeter += height
-        if(y == 0 or y + height == self.binHeight):
+        if(y == 0 or y2 == self.binHeight):
             perimeter += width
-        for rect in self.packedRects:
-            if(rect.x + rect.width == x or x + width == rect.x):
-                perimeter += self.computeCommonLength(y, y+height, rect.y, rect.y+rect.height)
-            if(rect.y == y + height or rect.y + rect.height == y):
-                perimeter += self.computeCommonLength(x, x + width, rect.x, rect.x + rect.width)
+        #Only the packed items having an edge on one of the edges of the rect can touch it.
+        #computeCommonLength is inlined below as this is the hot spot of the touching perimeter heuristic
+        for edges in (self.rightEdges.get(x), self.leftEdges.get(x2)):
+            if edges is None: continue
+            for rect in edges:
+                rectY1 = rect.y
+                rectY2 = rect.y2
+                if rectY1 < y2 and rectY2 > y:
+                    perimeter += (y2 if y2 < rectY2 else rectY2) - (y if y > rectY1 else rectY1)
+        for edges in (self.topEdges.get(y), self.bottomEdges.get(y2)):
+            if edges is None: continue
+            for rect in edges:
+                rectX1 = rect.x
+                rectX2 = rect.x2
+                if rectX1 < x2 and rectX2 > x:
+                    perimeter += (x2 if x2 < rectX2 else rectX2) - (x if x > rectX1 else rectX1)
 
         return perimeter
 
 
-    def isOverlapping(self, rect1, rect2):
+    def isOverlapping(self, rect1: Rect, rect2: Rect) -> bool:
         """Checks whether two items overlap
 
         Parameters
@@ -206,46 +310,44 @@ class Bin:
         rect2 : rect.Rect
             The second item.
         """
-        horizSkip = rect1.x >= rect2.x + rect2.width or rect1.x + rect1.width <= rect2.x
-        vertSkip = rect1.y >= rect2.y + rect2.height or rect1.y + rect1.height <= rect2.y
-        return not (horizSkip or vertSkip)
+        return not (rect1.x >= rect2.x2 or rect1.x2 <= rect2.x or rect1.y >= rect2.y2 or rect1.y2 <= rect2.y)
 
 
-    def computeCommonLength(self, start1, end1, start2, end2):
+    def computeCommonLength(self, start1: int, end1: int, start2: int, end2: int) -> int:
         """Compute common length."""
         if(start2 >= end1 or end2 <= start1): return 0
         return min(end1, end2) - max(start1, start2)
     
     
-    def computeDistance(self, x1, y1, x2, y2):
+    def computeDistance(self, x1: int, y1: int, x2: int, y2: int) -> float:
         """Compute distance."""
         return math.sqrt((x1-x2)*(x1-x2) + (y1-y2)*(y1-y2)) 
             
     
-    def getPackedRect(self):
+    def getPackedRect(self) -> List[Rect]:
         return self.packedRects #make sure packed rects will never be modified otherwise, returns a copy
     
     
-    def getPackedArea(self):
-        return int(self.occupiedArea)
+    def getPackedArea(self) -> int:
+        return self.occupiedArea
     
     
-    def getOccupancy(self):
+    def getOccupancy(self) -> float:
         return self.occupiedArea/(self.binWidth*self.binHeight)
     
     
-    def getTouchingPerimeter(self):
-        if(self.packedRects.isEmpty()): return 0
+    def getTouchingPerimeter(self) -> float:
+        if(len(self.packedRects) == 0): return 0
         touchingPerimeter = 0
         totalPer = 0
         for rect in self.packedRects:
-            touchingPerimeter += computeTouchingPerimeter(rect.x, rect.y, rect.width, rect.height)
+            touchingPerimeter += self.computeTouchingPerimeter(rect.x, rect.y, rect.width, rect.height)
             totalPer += 2*(rect.width + rect.height)
         
         return touchingPerimeter/totalPer        
 
 
-    def __eq__(self, other):
+    def __eq__(self, other) -> bool:
         if not isinstance(other, self.__class__): return False       
         if len(self.packedRects) != len(other.packedRects): return False 
         flag = True
@@ -258,24 +360,24 @@ class Bin:
         return flag
     
     
-    def __ne__(self, other):
+    def __ne__(self, other) -> bool:
         return not self.__eq__(other)
     
 
-    def __lt__(self, other):
+    def __lt__(self, other) -> bool:
         if not isinstance(other, self.__class__): return False
         return self.getOccupancy() < other.getOccupancy()
     
 
-    def __le__(self, other):
-        return self.__lt(other) or self.getOccupancy() == other.getOccupancy()
+    def __le__(self, other) -> bool:
+        return self.__lt__(other) or self.getOccupancy() == other.getOccupancy()
     
 
-    def __ge__(self, other):
+    def __ge__(self, other) -> bool:
         return not self.__lt__(other)
     
 
-    def __gt__(self, other):
+    def __gt__(self, other) -> bool:
         return not self.__lt__(other) and self.getOccupancy() != other.getOccupancy()
 
 
@@ -283,12 +385,12 @@ class Bin:
         return len(self.packedRects) 
     
 
-    def __hash__(self):
+    def __hash__(self) -> int:
         var = 3
         for rect in self.packedRects:
             var = 59 * var + hash(rect)
         return var
     
     
-    def __repr__(self):
+    def __repr__(self) -> str:
         return "Bin: " + str(self.getOccupancy())
\ No newline at end of file
@@ -1,5 +1,4 @@
 from typing import List
-import copy
 
 from rect import Rect   
 
@@ -14,18 +13,32 @@ class Instance:
             self.binHeight = args[1]
         # Queue for holding rects for this instance
         self.queue = []
+        # Total area of the rects, updated as rects are loaded
+        self.totalArea = 0
     
     
     def loadRectToPack(self, queue: List[Rect]) -> None:
         self.queue = []
+        self.totalArea = 0
         for i in range(len(queue)):
-            rect = queue[i] #copy.deepcopy(queue[i])
-            rect.id = i
+            rect = queue[i]
+            self.checkDimensions(rect)
+            rect.rectid = i
             self.queue.append(rect)
+            self.totalArea += rect.area
             
     
     def loadRect(self, rect: Rect):
+        self.checkDimensions(rect)
         self.queue.append(rect)
+        self.totalArea += rect.area
+    
+    
+    def checkDimensions(self, rect: Rect) -> None:
+        # The areas are summed as exact integers (see Bin.occupiedArea), so the dimensions are checked 
+        # once here when the items are loaded rather than on every insertion
+        if not isinstance(rect.width, int) or not isinstance(rect.height, int):
+            raise ValueError("Item dimensions must be integers")
     
     
     def setBinDim(self, binWidth: int, binHeight: int):
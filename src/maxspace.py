@@ -4,9 +4,11 @@ __email__   = "ahmedhassan@aims.ac.za"
 __status__  = "Production"
 
 
-import copy  
+from bisect import bisect_left
+from operator import attrgetter
+from typing import List, Optional
 
-from rect import Rect  
+from rect import Rect, INT_MAX  
 from bin import Bin, PackingHeuristic 
 
 
@@ -22,21 +24,82 @@ class MaxSpaceBin(Bin):
     Maximal space data structure : https://www.sciencedirect.com/science/article/pii/S0925527313001837
     """
     
-    def __init__(self, binWidth, binHeight):
+    __slots__ = ('maxFreeWidth', 'maxFreeHeight', 'freeRectsByArea', 'freeAreas', 'firstUnpruned')
+    
+    def __init__(self, binWidth: int, binHeight: int) -> None:
         super().__init__(binWidth, binHeight)
+        #The largest width and height among the maximal spaces (not necessarily of the same space)
+        self.maxFreeWidth = 0
+        self.maxFreeHeight = 0
+        #The maximal spaces sorted by area (ties keep their order in freeRects) and their areas. 
+        #Built on demand by the best area fit heuristic
+        self.freeRectsByArea = None
+        self.freeAreas = None
+        #The maximal spaces before this index do not contain one another. The ones after it have been 
+        #generated since the last pruning
+        self.firstUnpruned = 0
     
+    @classmethod
+    def createBins(cls, number: int, binWidth: int, binHeight: int) -> List['MaxSpaceBin']:
+        """Create several empty bins that are ready for packing.
+
+        This is equivalent to constructing each bin and calling `init`, but skips re-creating the 
+        containers that the constructor has just created and clones a single initial maximal space.
+
+        Parameters
+        ----------
+        number : int
+            The number of bins
+        binWidth : int
+            The width of each bin
+        binHeight : int
+            The height of each bin
+
+        Returns
+        -------
+        List[MaxSpaceBin]
+            The new bins
+        """
+        bins = [cls(binWidth, binHeight) for _ in range(number)]
+        maxSpace = Rect(binWidth, binHeight)
+        maxSpace.move(0, 0)
+        for abin in bins:
+            abin.freeRects = [maxSpace.clone()]
+            abin.maxFreeWidth = binWidth
+            abin.maxFreeHeight = binHeight
+            abin.freeRectsByArea = None
+            abin.firstUnpruned = 1
+        return bins
+
+
     @Override
     def setupFreeRects(self) -> None:
         #Initialize a list for the maximal spaces
         self.freeRects = []
         maxSpace = Rect(self.binWidth, self.binHeight)
-        maxSpace.x = 0
-        maxSpace.y = 0
+        maxSpace.move(0, 0)
         self.freeRects.append(maxSpace)
+        self.firstUnpruned = 1
+        self.indexFreeRects()
+
+
+    @Override
+    def indexFreeRects(self) -> None:
+        """Update the largest width and height of the maximal spaces and drop their area-sorted view."""
+        self.maxFreeWidth = max((r.width for r in self.freeRects), default=0)
+        self.maxFreeHeight = max((r.height for r in self.freeRects), default=0)
+        self.freeRectsByArea = None
+
+
+    def sortFreeRectsByArea(self) -> None:
+        """Build the view of the maximal spaces sorted by area used by the best area fit heuristic."""
+        #sorted is stable, so spaces of equal area are visited in the same order as in freeRects
+        self.freeRectsByArea = sorted(self.freeRects, key=attrgetter('area'))
+        self.freeAreas = [maxSpace.area for maxSpace in self.freeRectsByArea]
 
     
     @Override
-    def evaluatePacking(self, rect: Rect, heur: PackingHeuristic) -> Rect:
+    def evaluatePacking(self, rect: Rect, heur: PackingHeuristic) -> Optional[Rect]:
         """Evaluate the quality of packing an item using a specified packing heuristic.
 
         Parameters
@@ -53,21 +116,60 @@ class MaxSpaceBin(Bin):
             Otherwise, returns ``None``
         """
         if not self.packHeur: self.packHeur = heur
-        newRect = None
-        if heur == PackingHeuristic.BestAreaFit: 
-            newRect = self.insertBestArea(rect)
-        elif heur == PackingHeuristic.TouchingPerimeter: 
-            newRect = self.insertTouchingPerimeter(rect)
-        elif heur == PackingHeuristic.TopRightCornerDistance: 
-            newRect = self.insertTopRightCornerDistance(rect)
-        else:
+        methodName = self.heuristicMethods.get(heur)
+        if methodName is None:
             raise ValueError("Unkown packing heuristic")
         
-        return newRect
+        #Skip scanning the maximal spaces if rect is wider or taller than all of them
+        width = rect.width
+        height = rect.height
+        if (width > self.maxFreeWidth or height > self.maxFreeHeight) and\
+           (not self.canRotate or height > self.maxFreeWidth or width > self.maxFreeHeight):
+            return None
+        return getattr(self, methodName)(rect)
     
     
     @Override
-    def insert(self, rect: Rect, heuristic: PackingHeuristic) -> bool:
+    def getBestPossibleScore(self, rect: Rect, heur: PackingHeuristic) -> int:
+        """Get a lower bound on the ``score1`` that evaluatePacking can return for an item.
+
+        The bound is a perfect fit (no wasted area) for best area fit, touching along the whole perimeter 
+        for touching perimeter and packing at the bottom-left corner of the bin for top right corner distance.
+        A packing reaching it cannot be improved upon in another bin since a perfect fit also leaves no 
+        short side and the other two heuristics do not set ``score2``.
+
+        Parameters
+        ----------
+        rect : rect.Rect
+            The item
+        heur : PackingHeuristic
+            The packing heuristic
+
+        Returns
+        -------
+        int
+            The lower bound on ``score1``
+        """
+        width = rect.width
+        height = rect.height
+        if heur == PackingHeuristic.BestAreaFit:
+            return 0
+        if heur == PackingHeuristic.TouchingPerimeter:
+            return -2*(width + height)
+        if heur == PackingHeuristic.TopRightCornerDistance:
+            dx = self.binWidth - width
+            dy = self.binHeight - height
+            distSq = dx*dx + dy*dy
+            if self.canRotate:
+                dx = self.binWidth - height
+                dy = self.binHeight - width
+                distSq = max(distSq, dx*dx + dy*dy)
+            return -distSq
+        return super().getBestPossibleScore(rect, heur)
+
+    
+    @Override
+    def insert(self, rect: Rect, heuristic: PackingHeuristic, prune: bool = True) -> bool:
         """Insert an item in this bin using the specified packing heuristic to determine its location
         inside the bin. 
 
@@ -82,6 +184,11 @@ class MaxSpaceBin(Bin):
             The item
         heur : PackingHeuristic
             The packing heuristic
+        prune : bool
+            Whether to remove the non-maximal spaces right away (True) or to leave them until the next 
+            insertion with ``prune=True`` or call to `prune` (False). Unpruned spaces are valid free 
+            spaces, but they are also candidates for the packing heuristics and are split by later 
+            insertions, so deferring may change the packing
 
         Returns
         -------
@@ -93,20 +200,39 @@ class MaxSpaceBin(Bin):
             newRect = self.evaluatePacking(rect, heuristic) # returns a degenerate rect if packig is not possible                
         else:
             newRect = rect
+            #The position may have been assigned to x and y directly, refresh the right and top edges
+            newRect.move(rect.x, rect.y)
         
         #If packing rect is not possible
-        if newRect == None:
+        if newRect is None:
             return False
         
         #rect can be packed in the bin, update the data structure
         self.packRect(newRect)
         self.generateNewMaxSpaces(newRect)
         #remove degenerate and non-maximal spaces
-        self.pruneMaxSpaces()        
+        if prune: self.pruneMaxSpaces(self.firstUnpruned)
+        self.indexFreeRects()
         return True
 
+
+    @Override
+    def mergeFreeRects(self) -> None:
+        """Merge the free spaces and mark them all for the next pruning since an enlarged space may 
+        contain spaces that were already pruned."""
+        super().mergeFreeRects()
+        self.firstUnpruned = 0
+
+
+    @Override
+    def prune(self) -> None:
+        """Remove the non-maximal spaces left by insertions with ``prune=False``."""
+        if self.firstUnpruned < len(self.freeRects):
+            self.pruneMaxSpaces(self.firstUnpruned)
+            self.indexFreeRects()
+
     
-    def insertTopRightCornerDistance(self, rect: Rect) -> Rect:
+    def insertTopRightCornerDistance(self, rect: Rect) -> Optional[Rect]:
         """Pack an item using ``bin.PackingHeuristic.TopRightCornerDistance`` packing heuristic
 
         Parameters
@@ -120,41 +246,76 @@ class MaxSpaceBin(Bin):
             returns a new rect with its packing information set if the packing in this
             bin is possible. Otherwise, returns ``None``
         """
-        largestDist = -1
-        bestMaxSpaceIndex = -1
+        if self.canRotate: return self._insertTopRightCornerDistanceWithRotation(rect)
+        rectWidth = rect.width
+        rectHeight = rect.height
+        binWidth = self.binWidth
+        binHeight = self.binHeight
+        #The squared distance ranks the positions the same way as the distance, no need for sqrt
+        largestDistSq = -1
+        bestMaxSpace = None
+        for maxSpace in self.freeRects:
+            if rectWidth <= maxSpace.width and rectHeight <= maxSpace.height:
+                dx = binWidth - maxSpace.x - rectWidth
+                dy = binHeight - maxSpace.y - rectHeight
+                distSq = dx*dx + dy*dy
+                if distSq > largestDistSq:
+                    largestDistSq = distSq
+                    bestMaxSpace = maxSpace
+                    
+        #If rect cannot be inserted into current bin
+        if bestMaxSpace is None:
+            return None
+        
+        newRect = Rect(rectWidth, rectHeight)
+        newRect.move(bestMaxSpace.x, bestMaxSpace.y)
+        newRect.score1 = -largestDistSq #smaller is better
+        return newRect
+    
+    
+    def _insertTopRightCornerDistanceWithRotation(self, rect: Rect) -> Optional[Rect]:
+        #Same as insertTopRightCornerDistance but rect is also tried in the rotated position
+        rectWidth = rect.width
+        rectHeight = rect.height
+        binWidth = self.binWidth
+        binHeight = self.binHeight
+        largestDistSq = -1
+        bestMaxSpace = None
         isRotated = False
-        for i in range(len(self.freeRects)):
-            maxSpace = self.freeRects[i]
+        for maxSpace in self.freeRects:
+            spaceWidth = maxSpace.width
+            spaceHeight = maxSpace.height
             #Try to fit rect into maxSpace in upright position
-            if rect.width <= maxSpace.width and rect.height <= maxSpace.height:
-                dist = self.computeDistance(maxSpace.x + rect.width, maxSpace.y + rect.height,\
-                                            self.binWidth, self.binHeight)
-                if dist > largestDist:
-                    largestDist = dist
-                    bestMaxSpaceIndex = i
+            if rectWidth <= spaceWidth and rectHeight <= spaceHeight:
+                dx = binWidth - maxSpace.x - rectWidth
+                dy = binHeight - maxSpace.y - rectHeight
+                distSq = dx*dx + dy*dy
+                if distSq > largestDistSq:
+                    largestDistSq = distSq
+                    bestMaxSpace = maxSpace
                     isRotated = False                            
-            #If rotation is possible, try to fit rect in
-            if self.canRotate and rect.height <= maxSpace.width and rect.width <= maxSpace.height:
-                dist = self.computeDistance(maxSpace.x + rect.height, maxSpace.y + rect.width, binWidth, binHeight)
-                if dist > largestDist:
-                    largestDist = dist
-                    bestMaxSpaceIndex = i
+            #Try to fit rect in rotated
+            if rectHeight <= spaceWidth and rectWidth <= spaceHeight:
+                dx = binWidth - maxSpace.x - rectHeight
+                dy = binHeight - maxSpace.y - rectWidth
+                distSq = dx*dx + dy*dy
+                if distSq > largestDistSq:
+                    largestDistSq = distSq
+                    bestMaxSpace = maxSpace
                     isRotated = True 
                     
-        #If rect cannot be inserted into current bin
-        if bestMaxSpaceIndex == -1:
+        if bestMaxSpace is None:
             return None
         
         #Insert rect into the best maxSpace with the appropriate orientation
-        newRect = Rect(rect.width, rect.height)
+        newRect = Rect(rectWidth, rectHeight)
         if isRotated: newRect.rotate()
-        newRect.x = self.freeRects[bestMaxSpaceIndex].x
-        newRect.y = self.freeRects[bestMaxSpaceIndex].y
-        newRect.score1 = -largestDist #smaller is better
+        newRect.move(bestMaxSpace.x, bestMaxSpace.y)
+        newRect.score1 = -largestDistSq #smaller is better
         return newRect
     
     
-    def insertTouchingPerimeter(self, rect: Rect) -> Rect:
+    def insertTouchingPerimeter(self, rect: Rect) -> Optional[Rect]:
         """Pack an item using ``bin.PackingHeuristic.TouchingPerimeter`` packing heuristic
 
         Parameters
@@ -168,36 +329,61 @@ class MaxSpaceBin(Bin):
             returns a new rect with its packing information set if the packing in this
             bin is possible. Otherwise, returns ``None``
         """
+        if self.canRotate: return self._insertTouchingPerimeterWithRotation(rect)
+        rectWidth = rect.width
+        rectHeight = rect.height
         largestTouchingPerimeter = -1
-        bestMaxSpaceIndex = -1
+        bestMaxSpace = None
+        for maxSpace in self.freeRects:
+            if rectWidth <= maxSpace.width and rectHeight <= maxSpace.height:
+                perimeter = self.computeTouchingPerimeter(maxSpace.x, maxSpace.y, rectWidth, rectHeight)
+                if perimeter > largestTouchingPerimeter:
+                    largestTouchingPerimeter = perimeter
+                    bestMaxSpace = maxSpace
+                                    
+        if bestMaxSpace is None:
+            return None
+        
+        newRect = Rect(rectWidth, rectHeight)
+        newRect.move(bestMaxSpace.x, bestMaxSpace.y)
+        newRect.score1 = -largestTouchingPerimeter #smaller is better
+        return newRect
+    
+    
+    def _insertTouchingPerimeterWithRotation(self, rect: Rect) -> Optional[Rect]:
+        #Same as insertTouchingPerimeter but rect is also tried in the rotated position
+        rectWidth = rect.width
+        rectHeight = rect.height
+        largestTouchingPerimeter = -1
+        bestMaxSpace = None
         isRotated = False
-        for i in range(len(self.freeRects)):
-            maxSpace = self.freeRects[i]
-            if rect.width <= maxSpace.width and rect.height <= maxSpace.height:
-                perimeter = self.computeTouchingPerimeter(maxSpace.x, maxSpace.y, rect.width, rect.height)
+        for maxSpace in self.freeRects:
+            spaceWidth = maxSpace.width
+            spaceHeight = maxSpace.height
+            if rectWidth <= spaceWidth and rectHeight <= spaceHeight:
+                perimeter = self.computeTouchingPerimeter(maxSpace.x, maxSpace.y, rectWidth, rectHeight)
                 if perimeter > largestTouchingPerimeter:
                     largestTouchingPerimeter = perimeter
-                    bestMaxSpaceIndex = i
+                    bestMaxSpace = maxSpace
                     isRotated = False                            
-            if self.canRotate and rect.height <= maxSpace.width and rect.width <= maxSpace.height:
-                perimeter = self.computeTouchingPerimeter(maxSpace.x, maxSpace.y, rect.height, rect.width)
+            if rectHeight <= spaceWidth and rectWidth <= spaceHeight:
+                perimeter = self.computeTouchingPerimeter(maxSpace.x, maxSpace.y, rectHeight, rectWidth)
                 if perimeter > largestTouchingPerimeter:
                     largestTouchingPerimeter = perimeter
-                    bestMaxSpaceIndex = i
+                    bestMaxSpace = maxSpace
                     isRotated = True
                                     
-        if bestMaxSpaceIndex == -1:
+        if bestMaxSpace is None:
             return None
         
-        newRect = Rect(rect.width, rect.height)
+        newRect = Rect(rectWidth, rectHeight)
         if isRotated: newRect.rotate()
-        newRect.x = self.freeRects[bestMaxSpaceIndex].x
-        newRect.y = self.freeRects[bestMaxSpaceIndex].y
+        newRect.move(bestMaxSpace.x, bestMaxSpace.y)
         newRect.score1 = -largestTouchingPerimeter #smaller is better
         return newRect
     
     
-    def insertBestArea(self, rect: Rect) -> Rect:
+    def insertBestArea(self, rect: Rect) -> Optional[Rect]:
         """Pack an item using ``bin.PackingHeuristic.BestAreaFit`` packing heuristic
 
         Parameters
@@ -211,105 +397,212 @@ class MaxSpaceBin(Bin):
             returns a new rect with its packing information set if the packing in this
             bin is possible. Otherwise, returns ``None``
         """
-        bestWastedArea = float('inf')
-        bestShortSide = float('inf')
-        bestMaxSpaceIndex = -1
+        if self.canRotate: return self._insertBestAreaWithRotation(rect)
+        rectWidth = rect.width
+        rectHeight = rect.height
+        rectArea = rectWidth * rectHeight
+        bestWastedArea = INT_MAX
+        bestShortSide = INT_MAX
+        bestMaxSpace = None
+        if self.freeRectsByArea is None: self.sortFreeRectsByArea()
+        freeRectsByArea = self.freeRectsByArea
+        #Spaces smaller than rect cannot hold it, and the wasted area only grows along the sorted view. 
+        #Hence, stop at the first space that wastes more than the best one found so far
+        for i in range(bisect_left(self.freeAreas, rectArea), len(freeRectsByArea)):
+            maxSpace = freeRectsByArea[i]
+            spaceWidth = maxSpace.width
+            spaceHeight = maxSpace.height
+            if spaceWidth >= rectWidth and spaceHeight >= rectHeight:
+                wastedArea = spaceWidth * spaceHeight - rectArea
+                if wastedArea > bestWastedArea: break
+                horizLeftOver = spaceWidth - rectWidth
+                vertLeftOver = spaceHeight - rectHeight
+                shortSide = horizLeftOver if horizLeftOver < vertLeftOver else vertLeftOver
+                if wastedArea < bestWastedArea or (wastedArea == bestWastedArea and shortSide < bestShortSide):
+                    bestWastedArea = wastedArea
+                    bestShortSide = shortSide
+                    bestMaxSpace = maxSpace
+                                    
+        if bestMaxSpace is None:
+            return None
+        
+        newRect = Rect(rectWidth, rectHeight)
+        newRect.move(bestMaxSpace.x, bestMaxSpace.y)
+        newRect.score1 = bestWastedArea
+        newRect.score2 = bestShortSide
+        return newRect
+    
+    
+    def _insertBestAreaWithRotation(self, rect: Rect) -> Optional[Rect]:
+        #Same as insertBestArea but rect is also tried in the rotated position
+        rectWidth = rect.width
+        rectHeight = rect.height
+        rectArea = rectWidth * rectHeight
+        bestWastedArea = INT_MAX
+        bestShortSide = INT_MAX
+        bestMaxSpace = None
         isRotated = False
-        for i in range(len(self.freeRects)):
-            maxSpace = self.freeRects[i]
-            wastedArea = maxSpace.width * maxSpace.height - (rect.width * rect.height)
-            if maxSpace.width >= rect.width and maxSpace.height >= rect.height:
-                horizLeftOver = maxSpace.width - rect.width
-                vertLeftOver = maxSpace.height - rect.height
-                shortSide = min(horizLeftOver, vertLeftOver)
+        if self.freeRectsByArea is None: self.sortFreeRectsByArea()
+        freeRectsByArea = self.freeRectsByArea
+        for i in range(bisect_left(self.freeAreas, rectArea), len(freeRectsByArea)):
+            maxSpace = freeRectsByArea[i]
+            spaceWidth = maxSpace.width
+            spaceHeight = maxSpace.height
+            wastedArea = spaceWidth * spaceHeight - rectArea
+            if wastedArea > bestWastedArea: break
+            if spaceWidth >= rectWidth and spaceHeight >= rectHeight:
+                horizLeftOver = spaceWidth - rectWidth
+                vertLeftOver = spaceHeight - rectHeight
+                shortSide = horizLeftOver if horizLeftOver < vertLeftOver else vertLeftOver
                 if wastedArea < bestWastedArea or (wastedArea == bestWastedArea and shortSide < bestShortSide):
                     bestWastedArea = wastedArea
                     bestShortSide = shortSide
-                    bestMaxSpaceIndex = i
+                    bestMaxSpace = maxSpace
                     isRotated = False                            
-            if self.canRotate and maxSpace.width >= rect.height and maxSpace.height >= rect.width:
-                horizLeftOver = maxSpace.width - rect.height
-                vertLeftOver = maxSpace.height - rect.width
-                shortSide = min(horizLeftOver, vertLeftOver)
+            if spaceWidth >= rectHeight and spaceHeight >= rectWidth:
+                horizLeftOver = spaceWidth - rectHeight
+                vertLeftOver = spaceHeight - rectWidth
+                shortSide = horizLeftOver if horizLeftOver < vertLeftOver else vertLeftOver
                 if wastedArea < bestWastedArea or (wastedArea == bestWastedArea and shortSide < bestShortSide):
                     bestWastedArea = wastedArea
                     bestShortSide = shortSide
-                    bestMaxSpaceIndex = i
+                    bestMaxSpace = maxSpace
                     isRotated = True
                                     
-        if bestMaxSpaceIndex == -1:
+        if bestMaxSpace is None:
             return None
         
-        newRect = Rect(rect.width, rect.height)
+        newRect = Rect(rectWidth, rectHeight)
         if isRotated: newRect.rotate()
-        newRect.x = self.freeRects[bestMaxSpaceIndex].x
-        newRect.y = self.freeRects[bestMaxSpaceIndex].y
+        newRect.move(bestMaxSpace.x, bestMaxSpace.y)
         newRect.score1 = bestWastedArea
         newRect.score2 = bestShortSide
         return newRect
     
     
-    def generateNewMaxSpaces(self, rect: Rect) -> None:
-        """Generates new maximal spaces after packing ``rect``."""
-        numFreeRects = len(self.freeRects) #save it because elements will be added
-        i = 0
-        while i < numFreeRects:
-            freeRect = self.freeRects[i]
-            if not self.isOverlapping(freeRect, rect): 
-                i += 1
+    def generateNewMaxSpaces(self, rect: Rect) -> int:
+        """Generates new maximal spaces after packing ``rect``.
+
+        Returns
+        -------
+        int
+            The index of the first new maximal space. The new spaces are appended after the
+            free spaces that do not intersect ``rect``.
+        """
+        rectX1 = rect.x
+        rectX2 = rect.x2
+        rectY1 = rect.y
+        rectY2 = rect.y2
+        freeRects = self.freeRects
+        numFreeRects = len(freeRects) #save it because elements will be added
+        firstUnpruned = self.firstUnpruned
+        numRemoved = 0
+        numRemovedPruned = 0
+        for i in range(numFreeRects):
+            freeRect = freeRects[i]
+            freeX1 = freeRect.x
+            freeX2 = freeRect.x2
+            freeY1 = freeRect.y
+            freeY2 = freeRect.y2
+            if freeX1 >= rectX2 or freeX2 <= rectX1 or freeY1 >= rectY2 or freeY2 <= rectY1:
                 continue
-            #Horizontal overlap
-            if rect.x < freeRect.x + freeRect.width and rect.x + rect.width > freeRect.x:
-                #maxSpace on bottom of rect
-                if rect.y >  freeRect.y and rect.y < freeRect.y + freeRect.height:
-                    newFreeRect = copy.deepcopy(freeRect)
-                    newFreeRect.height = rect.y - freeRect.y
-                    self.freeRects.append(newFreeRect)
-                
-                #maxSpace on top of rect
-                if rect.y + rect.height > freeRect.y and rect.y + rect.height < freeRect.y + freeRect.height:
-                    newFreeRect = copy.deepcopy(freeRect)
-                    newFreeRect.y = rect.y + rect.height
-                    newFreeRect.height = freeRect.y + freeRect.height - (rect.y + rect.height)
-                    self.freeRects.append(newFreeRect)
-                
+            #freeRect overlaps rect on both axes. Every side of rect lying strictly inside freeRect
+            #cuts off a new maximal space
+            #maxSpace on bottom of rect
+            if rectY1 > freeY1:
+                newFreeRect = freeRect.clone()
+                newFreeRect.resize(freeRect.width, rectY1 - freeY1)
+                freeRects.append(newFreeRect)
             
-            #Vertical overalp
-            if rect.y < freeRect.y + freeRect.height and rect.y + rect.height > freeRect.y:
-                #maxSpace left to rect
-                if rect.x > freeRect.x and rect.x < freeRect.x + freeRect.width:
-                    newFreeRect = copy.deepcopy(freeRect)
-                    newFreeRect.width = rect.x - freeRect.x
-                    self.freeRects.append(newFreeRect)
-                
-                #maxSpace right to rect
-                if rect.x + rect.width > freeRect.x and rect.x + rect.width < freeRect.x + freeRect.width:
-                    newFreeRect = copy.deepcopy(freeRect)
-                    newFreeRect.x = rect.x + rect.width
-                    newFreeRect.width = freeRect.x + freeRect.width - (rect.x + rect.width)
-                    self.freeRects.append(newFreeRect)
-                
+            #maxSpace on top of rect
+            if rectY2 < freeY2:
+                newFreeRect = freeRect.clone()
+                newFreeRect.move(freeX1, rectY2)
+                newFreeRect.resize(freeRect.width, freeY2 - rectY2)
+                freeRects.append(newFreeRect)
             
-            #FreeRect should be removed as it is intersecting rect
-            self.freeRects.pop(i)
-            numFreeRects -= 1
+            #maxSpace left to rect
+            if rectX1 > freeX1:
+                newFreeRect = freeRect.clone()
+                newFreeRect.resize(rectX1 - freeX1, freeRect.height)
+                freeRects.append(newFreeRect)
+            
+            #maxSpace right to rect
+            if rectX2 < freeX2:
+                newFreeRect = freeRect.clone()
+                newFreeRect.move(rectX2, freeY1)
+                newFreeRect.resize(freeX2 - rectX2, freeRect.height)
+                freeRects.append(newFreeRect)
+            
+            #FreeRect should be removed as it is intersecting rect. Mark it and compact the list once at the end
+            freeRects[i] = None
+            numRemoved += 1
+            if i < firstUnpruned: numRemovedPruned += 1
+        
+        if numRemoved > 0:
+            self.freeRects = [freeRect for freeRect in freeRects if freeRect is not None]
+            #compaction keeps the order, so the pruned spaces are still at the front
+            self.firstUnpruned = firstUnpruned - numRemovedPruned
+        return numFreeRects - numRemoved
             
     
-    def pruneMaxSpaces(self):
-        """Prune the list of maximal spaces by removing degenerate maximal spaces."""
-        toRemove = set()
-        for i in range(len(self.freeRects)):
-            rectI = self.freeRects[i]
-            for j in range(i+1, len(self.freeRects)):
-                rectJ = self.freeRects[j]
-                #If rect j is contained in rect i
-                if rectJ.isContainedIn(rectI):
-                    toRemove.add(j)
-                
-                #If rect i is contained in rect j
-                elif rectI.isContainedIn(rectJ):
-                    toRemove.add(i)
-                    break 
-        tmp = [self.freeRects[i] for i in range(len(self.freeRects)) if i not in toRemove]
-        self.freeRects = tmp[:]
-        if len(self.freeRects) == 0 and self.getOccupancy() < 1.0: raise ValueError("Error")
\ No newline at end of file
+    def pruneMaxSpaces(self, firstNew: int = 0) -> None:
+        """Prune the list of maximal spaces by removing non-maximal spaces.
+
+        A space is removed if it is contained in another space. Of several identical spaces
+        only the first one is kept.
+
+        The spaces are swept in increasing order of their left edge (ties broken so that a
+        space always comes after any space containing it). A space is compared only against
+        the kept spaces whose right edge has not been passed by the sweep yet.
+
+        Parameters
+        ----------
+        firstNew : int
+            The index of the first space added since the last pruning. The spaces before it are
+            assumed to be pruned already, i.e., none of them contains another, so they are only
+            compared against the new spaces. By default all spaces are considered new.
+        """
+        def sweep(active: List[Rect], x1: int, x2: int, y1: int, y2: int) -> bool:
+            #drop the spaces behind the sweep from active and check whether one of them contains the space
+            isContained = False
+            stillActive = []
+            for rectI in active:
+                iX2 = rectI.x2
+                #rectI ends before the sweep position, no later space can be contained in it
+                if iX2 < x1: continue
+                stillActive.append(rectI)
+                #rectI.x <= x1 is guaranteed by the sweep order
+                if not isContained and iX2 >= x2 and rectI.y <= y1 and rectI.y2 >= y2:
+                    isContained = True
+            active[:] = stillActive
+            return isContained
+
+        freeRects = self.freeRects
+        sweepKeys = [(r.x, -r.x2, r.y, -r.y2, i) for i, r in enumerate(freeRects)]
+        sweepKeys.sort()
+        keep = [False] * len(freeRects)
+        activeOld = []
+        activeNew = []
+        for x1, negX2, y1, negY2, j in sweepKeys:
+            isNew = j >= firstNew
+            #an old space can only be contained in a new one
+            isContained = sweep(activeNew, x1, -negX2, y1, -negY2)
+            if isNew and not isContained:
+                isContained = sweep(activeOld, x1, -negX2, y1, -negY2)
+            if not isContained:
+                keep[j] = True
+                (activeNew if isNew else activeOld).append(freeRects[j])
+        self.freeRects = [freeRects[i] for i in range(len(freeRects)) if keep[i]]
+        self.firstUnpruned = len(self.freeRects)
+        if len(self.freeRects) == 0 and self.getOccupancy() < 1.0: raise ValueError("Error")
+
+
+    #The name of the method implementing each packing heuristic. Looking it up here is cheaper than comparing
+    #heur against each member of PackingHeuristic on every call of evaluatePacking. The method is resolved 
+    #by name so that overrides in subclasses are used
+    heuristicMethods = {
+        PackingHeuristic.BestAreaFit: 'insertBestArea',
+        PackingHeuristic.TouchingPerimeter: 'insertTouchingPerimeter',
+        PackingHeuristic.TopRightCornerDistance: 'insertTopRightCornerDistance',
+    }
@@ -3,33 +3,98 @@ __license__ = "MIT License"
 __email__   = "ahmedhassan@aims.ac.za"
 __status__  = "Production"
 
+import sys
+
+
+#Sentinel for scores that are not set yet. Scores are integers, so an int keeps the comparisons on ints
+INT_MAX = sys.maxsize
+
 
 class Rect:
     
-    def __init__(self, width: int, height: int):
+    __slots__ = ('width', 'height', 'area', 'score1', 'score2', 'x', 'y', 'x2', 'y2', '_id')
+    
+    def __init__(self, width: int, height: int) -> None:
         self.width = width
         self.height = height
         self.area = width * height
-        self.score1 = float('inf')
-        self.score2 = float('inf')
+        self.score1 = INT_MAX
+        self.score2 = INT_MAX
         self.x = -1 #not packed yet
         self.y = -1
+        #right and top edges, kept in sync by move, resize and rotate. Use these methods to place or 
+        #resize a rect rather than assigning x, y, width or height directly
+        self.x2 = self.x + width
+        self.y2 = self.y + height
         self._id = -1
-        
-        
-        def getid(self):
-            return self._id
-        def setid(self, x):
-            self._id = x
-        def delid(self):
-            del self._id
-        rectid = property(getid, setid, delid)
 
     
+    @property
+    def rectid(self) -> int:
+        return self._id
+    
+    
+    @rectid.setter
+    def rectid(self, rectid: int) -> None:
+        self._id = rectid
+    
+    
+    def clone(self) -> 'Rect':
+        #a cheap alternative to copy.deepcopy, bypasses __init__ and copies the fields directly
+        rect = self.__class__.__new__(self.__class__)
+        rect.width = self.width
+        rect.height = self.height
+        rect.area = self.area
+        rect.score1 = self.score1
+        rect.score2 = self.score2
+        rect.x = self.x
+        rect.y = self.y
+        rect.x2 = self.x2
+        rect.y2 = self.y2
+        rect._id = self._id
+        return rect
+    
+    
+    def __copy__(self) -> 'Rect':
+        return self.clone()
+    
+    
+    def __deepcopy__(self, memo) -> 'Rect':
+        #all fields are immutable, a copy is as deep as it gets
+        return self.clone()
+    
+    
+    @property
+    def right(self) -> int:
+        return self.x2
+    
+    
+    @property
+    def top(self) -> int:
+        return self.y2
+    
+    
+    def move(self, x: int, y: int) -> None:
+        self.x = x
+        self.y = y
+        self.x2 = x + self.width
+        self.y2 = y + self.height
+    
+    
+    def resize(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.area = width * height
+        self.x2 = self.x + width
+        self.y2 = self.y + height
+    
+    
     def rotate(self) -> None:
         tmp = self.width
         self.width = self.height
         self.height = tmp
+        self.x2 = self.x + self.width
+        self.y2 = self.y + self.height
         
     
     def isDegenerate(self) -> bool:
@@ -44,31 +109,23 @@ class Rect:
     def removePackingInfo(self) -> None:
         self.x = -1
         self.y = -1
-        self.score1 = float('inf')
-        self.score2 = float('inf')
+        self.x2 = self.width - 1
+        self.y2 = self.height - 1
+        self.score1 = INT_MAX
+        self.score2 = INT_MAX
     
     
-    def computeCommonHorizLength(self, rect) -> int:
-        r1x1 = self.x 
-        r1x2 = self.x + self.width
-        r2x1 = rect.x 
-        r2x2 = rect.x + rect.width
-        return min(r1x2, r2x2) - max(r1x1, r2x1)
+    def computeCommonHorizLength(self, rect: 'Rect') -> int:
+        return min(self.x2, rect.x2) - max(self.x, rect.x)
     
     
-    def computeCommonVertLength(self, rect) -> int:
-        r1y1 = self.y 
-        r1y2 = self.y + self.height
-        r2y1 = rect.y 
-        r2y2 = rect.y + rect.height
-        return min(r1y2, r2y2) - max(r1y1, r2y1)
+    def computeCommonVertLength(self, rect: 'Rect') -> int:
+        return min(self.y2, rect.y2) - max(self.y, rect.y)
     
 
-    def isContainedIn(self, rect) -> bool:
+    def isContainedIn(self, rect: 'Rect') -> bool:
         #note that isContained covers equals!
-        return self.x >= rect.x and self.y >= rect.y\
-               and self.x + self.width <= rect.x + rect.width\
-               and self.y + self.height <= rect.y + rect.height
+        return self.x >= rect.x and self.y >= rect.y and self.x2 <= rect.x2 and self.y2 <= rect.y2
     
     
     def computeCommonLength(self, start1: int, end1: int, start2: int, end2: int) -> int:
@@ -76,19 +133,9 @@ class Rect:
         return min(end1, end2) - max(start1, start2)
     
     
-    def isOverlapping(self, rect) -> bool:
-        #if overlaps horizontally
-        if(not(self.x >= rect.x + rect.width or self.x + self.width <= rect.x)):
-            if(self.computeCommonLength(self.y, self.y+self.height, rect.y, rect.y+rect.height) > 0):
-                return True
-        
-        #if vertically overlaps
-        elif(not(self.y >= rect.y + rect.height or self.y + self.height <= rect.y)):
-            if(self.computeCommonLength(self.x, self.x+self.width, rect.x, rect.x+rect.width) > 0):
-                return True        
-        else:
-            return False
-        return False
+    def isOverlapping(self, rect: 'Rect') -> bool:
+        #two rects overlap unless one of them lies entirely to one side of the other
+        return not (self.x2 <= rect.x or rect.x2 <= self.x or self.y2 <= rect.y or rect.y2 <= self.y)
     
         
     def __eq__(self, other) -> bool:        
@@ -112,7 +159,7 @@ class Rect:
     def __ge__(self, other) -> bool:
         return not self.__lt__(other)
 
-    def __hash__(self):
+    def __hash__(self) -> int:
         var = 7
         var = 79 * var + self.width
         var = 79 * var + self.height
@@ -3,10 +3,18 @@ __license__ = "MIT License"
 __email__   = "ahmedhassan@aims.ac.za"
 __status__  = "Production"
 
-import random as rng  
-import copy 
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
 
-from typing import List  
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from operator import attrgetter
+from typing import List, Optional, Tuple
 
 from rect import Rect   
 from solution import RBPSolution
@@ -21,13 +29,15 @@ class RectPacking:
     ----------
     seed : int
         a seed for the random number generator
+    rng : random.Random
+        The random number generator of this problem, used to seed the solutions and shuffle the items
     """     
     
     
     
     def __init__(self, seed):
         self.seed = seed
-        rng.seed(seed)        
+        self.rng = random.Random(seed)
         self.instanceID = -1
         # instance list
         self.instanceList = []
@@ -35,58 +45,89 @@ class RectPacking:
         self.packHeur = PackingHeuristic.BestAreaFit        
 
         
-    def loadInstance(self, path: str):
+    def loadInstance(self, path: str, cache: bool = False):
         """Read the problem instance from a file.
 
         Parameters
         ----------
         path : str
             Path to the file defining the problem instance
+        cache : bool
+            Whether to store the parsed file in ``path + '.json'`` and read it from there on later calls 
+            as long as it is newer than the instance file
         """
-        line = None
-        rectList = []
-        numItems = -1
-        #Count the number of headings
-        headingLines = 0 
-        #Mark the beginning of reading a new instance. A problem file contains 50 instances
-        isNewInstance = False 
-        instance = Instance()
-        f = open(path, 'r')
-        for line in f:
-            tokens = line.split()
-            if len(tokens) == 0: #file contains new lines to separate instance
-                instance.loadRectToPack(rectList)
-                self.instanceList.append(instance)
-                continue              
-            if "PROBLEM" in line:
-                isNewInstance = True
-                headingLines += 1
-                instance = Instance()
-                continue #read the next             
-            if(isNewInstance):
-                #First heading is number of items
-                if headingLines == 1:
-                    numItems = int(tokens[0].strip())
-                    rectList = []
-                    headingLines += 1
-                #Second heading is the numbering of the instances
-                elif headingLines == 2:
-                    headingLines += 1
-                #Third heading is the bin dimensions
-                elif headingLines == 3:
-                    binWidth = int(tokens[0].strip())
-                    binHeight = int(tokens[1].strip())
-                    instance.setBinDim(binWidth, binHeight)
-                    headingLines = 0 #heading lines are done. reset the count
-                    isNewInstance = False
-                else: pass                            
-            else: #Not a new instance
-                width = int(tokens[0].strip())
-                height = int(tokens[1].strip())
-                rect = Rect(width, height)
-                #instance.loadRect(rect)
-                rectList.append(rect)
-        f.close()
+        data = self._readCachedInstance(path) if cache else None
+        if data is None:
+            with open(path, 'r') as f:
+                data = self._parseInstances(f.read())
+            if cache: self._writeCachedInstance(path, data)
+        self.instanceList.extend(self._buildInstances(data))
+
+
+    @staticmethod
+    def _buildInstances(data: List[Tuple[int, int, List[int]]]) -> List[Instance]:
+        """Create the instances from the ``(binWidth, binHeight, dims)`` tuples of a parsed problem file."""
+        instances = []
+        for binWidth, binHeight, dims in data:
+            instance = Instance(binWidth, binHeight)
+            instance.loadRectToPack([Rect(width, height) for width, height in zip(dims[0::2], dims[1::2])])
+            instances.append(instance)
+        return instances
+
+
+    @staticmethod
+    def _parseInstances(text: str) -> List[Tuple[int, int, List[int]]]:
+        """Parse a problem file into ``(binWidth, binHeight, dims)`` tuples where `dims` holds the width 
+        and the height of each item one after the other."""
+        data = []
+        #A problem file contains 50 instances separated by blank lines
+        for block in re.split(r"\n\s*\n", text):
+            lines = block.strip().splitlines()
+            #Find the heading of the instance
+            start = next((i for i, line in enumerate(lines) if "PROBLEM" in line), None)
+            if start is None: continue
+            #First heading is number of items, second is the numbering of the instances 
+            #and the third is the bin dimensions
+            tokens = lines[start + 3].split()
+            #The remaining lines hold the width and the height of the items. Convert them all in one go
+            itemLines = lines[start + 4:]
+            #The first item line is usually annotated with "H(I),W(I),I=1,...,N", keep only its dimensions
+            itemTokens = itemLines[0].split()[:2] + " ".join(itemLines[1:]).split() if itemLines else []
+            if len(itemTokens) != 2*len(itemLines):
+                #Some lines hold more than the width and the height
+                itemTokens = [token for line in itemLines for token in line.split()[:2]]
+            data.append((int(tokens[0]), int(tokens[1]), list(map(int, itemTokens))))
+        return data
+
+
+    @staticmethod
+    def _readCachedInstance(path: str) -> Optional[List[Tuple[int, int, List[int]]]]:
+        """Read the parsed problem file from its cache, returns ``None`` if the cache is missing, stale or 
+        does not hold what is expected."""
+        cachePath = path + '.json'
+        try:
+            if os.path.getmtime(cachePath) < os.path.getmtime(path): return None
+            with open(cachePath, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+        def isInt(value) -> bool: return type(value) is int
+        if not isinstance(data, list): return None
+        for entry in data:
+            if not (isinstance(entry, list) and len(entry) == 3 and isInt(entry[0]) and isInt(entry[1]) and 
+                    isinstance(entry[2], list) and len(entry[2]) % 2 == 0 and all(map(isInt, entry[2]))):
+                return None
+        return data
+
+
+    @staticmethod
+    def _writeCachedInstance(path: str, data: List[Tuple[int, int, List[int]]]) -> None:
+        """Store the parsed problem file next to it. Failing to write the cache is not an error."""
+        try:
+            with open(path + '.json', 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+        except OSError:
+            pass
     
 
     def getProblemSize(self) -> int:
@@ -113,9 +154,9 @@ class RectPacking:
             An empty solution
         """
         instance = self.instanceList[self.instanceID]
-        sol = RBPSolution(instance.binWidth, instance.binHeight) 
+        sol = RBPSolution(instance.binWidth, instance.binHeight, instance.totalArea, len(instance)) 
         # Get a random seed
-        sol.seed(rng.randint(1, 1e5))
+        sol.seed(self.rng.randint(1, 100000))
         return sol
 
     
@@ -132,37 +173,58 @@ class RectPacking:
         self.instanceID = instanceID 
             
     
-    def initializeSolution(self, sort=True) -> None:
+    def initializeSolution(self, sort=True, validate=False) -> RBPSolution:
         """Initialize a solution.
 
         Parameters
         ----------
         sort : bool
             Whether to sort the items before packing ``sort=True`` or shuffle the items ``sort=False``
+        validate : bool
+            Whether to check that the created solution is feasible and raise a ``RuntimeError`` otherwise.
+            The check is skipped when Python runs with ``-O``.
         """
-        instance = self.instanceList[self.instanceID]
-        sol = RBPSolution(instance.binWidth, instance.binHeight) 
-        sol.seed(rng.randint(1, 1e5))
-        #Get a clone of the items
-        rectList = self.getPackingQueue() 
-        
-        if sort:
-            # Sort rects by their areas
-            rectList.sort(reverse=True)
-        else:
-            # Randomize the order
-            rng.shuffle(rectList)
-
-        # Pack rects
-        sol.pack(rectList, self.packHeur)
-
-        # Comment the following two lines if you want to skip checking whether the created solution 
-        # is valid. If you leave it, this will slow the initial solution creation a bit.
-        if not sol.isFeasible():
+        sol = createSolution(self.instanceList[self.instanceID], self.packHeur, self.rng, sort)
+
+        # Checking the created solution scans every pair of items in each bin, so it is opt-in
+        if __debug__ and validate and not sol.isFeasible():
             raise RuntimeError("Initial solution is not feasible")
         return sol
         
     
+    def initializeSolutions(self, number: int, workers: Optional[int] = None, sort=True) -> List[RBPSolution]:
+        """Initialize several independent solutions in parallel worker processes.
+
+        A base seed is drawn from the random number generator of this problem and the i-th solution is 
+        created from its own random number generator seeded with ``base + i``. Hence, every call returns 
+        new solutions, the results are reproducible from the seed of this problem and they do not depend 
+        on the number of workers.
+
+        Parameters
+        ----------
+        number : int
+            The number of solutions
+        workers : int
+            The number of worker processes. Defaults to the number of processors. If ``workers=1`` the 
+            solutions are created in this process
+        sort : bool
+            Whether to sort the items before packing ``sort=True`` or shuffle the items ``sort=False``
+
+        Returns
+        -------
+        List[solution.RBPSolution]
+            The solutions
+        """
+        instance = self.instanceList[self.instanceID]
+        base = self.rng.randrange(2**32)
+        seeds = range(base, base + number)
+        if workers == 1:
+            return [_initializeSolution(instance, self.packHeur, seed, sort) for seed in seeds]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_initializeSolution, repeat(instance), repeat(self.packHeur), seeds, 
+                                     repeat(sort)))
+        
+    
     def getPackingQueue(self) -> List[Rect]:
         """Get the list of items to be packed.
 
@@ -172,7 +234,7 @@ class RectPacking:
             A list of items to be packed
         """
         instance = self.instanceList[self.instanceID]
-        return copy.deepcopy(instance.queue)
+        return [rect.clone() for rect in instance.queue]
     
 
     def getDefaultPackHeur(self) -> PackingHeuristic:
@@ -192,9 +254,51 @@ class RectPacking:
     
 
 
-if __name__ == "__main__":
+def createSolution(instance: Instance, packHeur: PackingHeuristic, rand: random.Random, sort=True) -> RBPSolution:
+    """Create a solution by packing the items of `instance` with `packHeur`.
+
+    Parameters
+    ----------
+    instance : instance.Instance
+        The problem instance
+    packHeur : bin.PackingHeuristic
+        The packing heuristic
+    rand : random.Random
+        The random number generator used to seed the solution and shuffle the items
+    sort : bool
+        Whether to sort the items before packing ``sort=True`` or shuffle the items ``sort=False``
+
+    Returns
+    -------
+    solution.RBPSolution
+        The solution
+    """
+    sol = RBPSolution(instance.binWidth, instance.binHeight, instance.totalArea, len(instance)) 
+    sol.seed(rand.randint(1, 100000))
+    #Get a clone of the items
+    rectList = [rect.clone() for rect in instance.queue]
+    
+    if sort:
+        # Sort rects by their areas (same order as sorting on Rect.__lt__ but the comparisons run in C)
+        rectList.sort(key=attrgetter('area'), reverse=True)
+    else:
+        # Randomize the order
+        rand.shuffle(rectList)
+
+    # Pack rects
+    sol.pack(rectList, packHeur)
+    return sol
+
+
+def _initializeSolution(instance: Instance, packHeur: PackingHeuristic, seed: int, sort: bool) -> RBPSolution:
+    # Runs in the worker processes of RectPacking.initializeSolutions, so it must be a module-level function
+    return createSolution(instance, packHeur, random.Random(seed), sort)
+
+
+def solve(filename: str) -> None:
+    """Solve the first instance in `filename` with the default packing heuristic and then with the 
+    touching perimeter heuristic."""
     problem = RectPacking(12345)
-    filename = "D:\\Data\\RBP\\Class_10.2bp"
     print("Loading: ", filename)
     problem.loadInstance(filename)
     instID = 0
@@ -211,11 +315,32 @@ if __name__ == "__main__":
     print(f"Packing heuristic used: {problem.packHeur}\n")
 
     print("Solving instance: ", instID)  
-    soltuion = problem.getEmptySolution()
+    solution = problem.getEmptySolution()
     rectList = problem.getPackingQueue()
-    rng.shuffle(rectList)
+    problem.rng.shuffle(rectList)
     solution.pack(rectList, PackingHeuristic.TouchingPerimeter)
     if not solution.isFeasible():
         raise RuntimeError("Infeasible solution")
     print("Number of bins = ", solution.getNumberOfBins())
     print("Packing heuristic used: ", PackingHeuristic.TouchingPerimeter)    
+
+
+def main(argv: List[str]) -> None:
+    """Usage: python rectpacking.py <instance file> [--profile]
+
+    With ``--profile`` the run is done under cProfile and the most expensive calls are printed.
+    """
+    args = [arg for arg in argv if arg != "--profile"]
+    if len(args) != 1:
+        print(main.__doc__)
+        sys.exit(2)
+    if "--profile" not in argv:
+        solve(args[0])
+        return
+    profiler = cProfile.Profile()
+    profiler.runcall(solve, args[0])
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -4,10 +4,11 @@ __email__   = "ahmedhassan@aims.ac.za"
 __status__  = "Production"
 
 
-import random as rng 
-from typing import List  
+import random
+from operator import attrgetter
+from typing import List, Optional, Tuple
 
-from rect import Rect  
+from rect import Rect, INT_MAX  
 from bin import Bin, PackingHeuristic  
 from maxspace import MaxSpaceBin
 
@@ -25,16 +26,28 @@ class RBPSolution:
         The list of bins
     rectList : List[rect.Rect]
         The list of items
+    totalArea : int
+        The total area of the items if known in advance (e.g., from instance.Instance), otherwise ``None``
+    numItems : int
+        The number of items `totalArea` refers to. `totalArea` is only used for lists of this many items
+    rng : random.Random
+        The random number generator of this solution
     """
 
+    __slots__ = ('binWidth', 'binHeight', 'binList', 'rectList', 'numRects', 'lowerbnd', 'totalArea', 'numItems', 
+                 'rng')
+
         
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, totalArea: Optional[int] = None, numItems: Optional[int] = None):
         self.binWidth = width
         self.binHeight = height
         self.binList = [] 
         self.rectList = None
         self.numRects = None
         self.lowerbnd = None        
+        self.totalArea = totalArea
+        self.numItems = numItems
+        self.rng = random.Random()
         
 
 
@@ -46,10 +59,10 @@ class RBPSolution:
         seed : int
             The seed for the random number generator for this solution
         """
-        rng.seed(seed)
+        self.rng.seed(seed)
     
 
-    def pack(self, rectList: List[Rect]=None, heur: PackingHeuristic=None, first=False):
+    def pack(self, rectList: List[Rect]=None, heur: PackingHeuristic=None, first=False, pruneInterval: int = 1):
         """Pack the items in `rectList` using a specified packing heuristic.
 
         Parameters
@@ -60,49 +73,85 @@ class RBPSolution:
             The packing heuristic
         first : bool
             Whether to pack the item in the first available bin (if True) or in the best bin (if False)
+        pruneInterval : int
+            Remove the non-maximal spaces of a bin only on every `pruneInterval`-th insertion and once at
+            the end. The default prunes on every insertion. Larger values may be faster (e.g., 2 to 4), 
+            but the packing can differ since the heuristics then also consider non-maximal spaces
         """
+        if pruneInterval < 1:
+            raise ValueError("The value of pruneInterval should be at least 1")
 
         # Compute a continuous lower bound on the number of bins
         self.binList = []
         if rectList: self.rectList = rectList        
-        if not self.lowerbnd:
+        if self.lowerbnd is None:
             self.numRects = len(rectList)
             self.lowerbnd = self.computeLowerBound(rectList) 
-        self.binList = []
 
         # Initialize bins
-        if not first:
-            for i in range(self.lowerbnd):
-                self.binList.append(self.openNewBin()) 
-        else:
-            self.binList.append(self.openNewBin())
+        self.binList = self.openNewBins(self.lowerbnd if not first else 1)
 
         # Consider packing the rects according to their order
-        for curRect in self.rectList:            
-            bestValue1 = float('inf')
-            bestValue2 = float('inf')
-            bestBin = None 
-            bestRect = None
-            
-            # Determine the best bin for the current rect
-            for abin in self.binList:
-                curRect.removePackingInfo()
-                newRect = abin.evaluatePacking(curRect, heur) # returns None if rect cannot be inserted
-                if newRect != None and (newRect.score1 < bestValue1 or (newRect.score1 == bestValue1 and newRect.score2 < bestValue2)):
-                    bestValue1 = newRect.score1
-                    bestValue2 = newRect.score2
-                    bestBin = abin
-                    bestRect = newRect
+        for i, curRect in enumerate(self.rectList):            
+            bestBin, bestRect = self.findBestBin(curRect, heur)
+            prune = (i + 1) % pruneInterval == 0
                             
             #if a bin is found, pack rect
-            if(bestBin != None):
-                bestBin.insert(bestRect, heur)
+            if(bestBin is not None):
+                bestBin.insert(bestRect, heur, prune)
             
             #otherwise, open a new bin
             else:
                 newBin = self.openNewBin()
-                newBin.insert(curRect, heur) #no need to evaluate packing
+                newBin.insert(curRect, heur, prune) #no need to evaluate packing
                 self.binList.append(newBin)
+
+        if pruneInterval > 1:
+            for abin in self.binList:
+                abin.prune()
+
+
+    def findBestBin(self, rect: Rect, heur: PackingHeuristic) -> Tuple[Optional[Bin], Optional[Rect]]:
+        """Find the open bin in which packing an item scores best using a specified packing heuristic.
+
+        The packing information of `rect` is cleared. The bins whose free area is smaller than the area 
+        of `rect` are skipped without evaluating the packing.
+
+        Parameters
+        ----------
+        rect : Rect
+            The item
+        heur : PackingHeuristic
+            The packing heuristic
+
+        Returns
+        -------
+        Tuple[bin.Bin, rect.Rect]
+            The best bin and a new item with its packing information in that bin set. If the item cannot 
+            be packed in any open bin, returns ``(None, None)``
+        """
+        bestValue1 = INT_MAX
+        bestValue2 = INT_MAX
+        bestBin = None 
+        bestRect = None
+        # A bin occupied beyond this cannot have enough free area left for rect
+        maxOccupiedArea = self.binWidth*self.binHeight - rect.area
+        # evaluatePacking does not modify rect, so clearing its packing info once is enough
+        rect.removePackingInfo()
+        for abin in self.binList:
+            if abin.occupiedArea > maxOccupiedArea: continue
+            newRect = abin.evaluatePacking(rect, heur) # returns None if rect cannot be inserted
+            if newRect is None: continue
+            # Lexicographic comparison on (score1, score2), score2 is read only on ties
+            score1 = newRect.score1
+            if score1 < bestValue1 or (score1 == bestValue1 and newRect.score2 < bestValue2):
+                bestValue1 = score1
+                bestValue2 = newRect.score2
+                bestBin = abin
+                bestRect = newRect
+                # No later bin can beat a packing that reaches the best possible score (ties keep the earlier bin)
+                if score1 <= abin.getBestPossibleScore(rect, heur): break
+        return bestBin, bestRect
     
     
     def removeAndRepack(self, heur: PackingHeuristic, percentage: float, reverse: bool, sort: bool, first=False) -> float:
@@ -130,24 +179,21 @@ class RBPSolution:
         
         # Determine the number of items to remove
         number = int(percentage*self.numRects + 1)
-        # At least remove two items
-        number = max(number, 2)
+        # At least remove two items but no more than the number of items
+        number = min(max(number, 2), self.numRects)
         
-        if reverse:
-            subList = self.rectList[:number]
-        else:
-            subList = self.rectList[self.numRects-number:]
+        # The items are packed in the order of rectList, so the last-packed items are at its end
+        start = self.numRects - number if reverse else 0
+        end = start + number
+        subList = self.rectList[start:end]
             
         if sort:
-            subList.sort(reverse=True)
+            subList.sort(key=attrgetter('area'), reverse=True)
         else:
             self.perturb(subList) # We perturb it twice if not sort since perturb by design do a small perturbation
         
-        # Slicing will create a copy of the list. Need to update the original list
-        if reverse:
-            self.rectList[:number] = subList
-        else:
-            self.rectList[self.numRects-number:] = subList
+        # Slicing creates a copy of the list. Write the reordered items back in place
+        self.rectList[start:end] = subList
 
         # Packed the removed items
         self.pack(heur=heur, first=first)
@@ -163,26 +209,32 @@ class RBPSolution:
             
  
     def openNewBin(self) -> Bin:
-        newBin = MaxSpaceBin(self.binWidth, self.binHeight)
-        newBin.init()
-        return newBin
+        return self.openNewBins(1)[0]
+
+
+    def openNewBins(self, number: int) -> List[Bin]:
+        return MaxSpaceBin.createBins(number, self.binWidth, self.binHeight)
     
     
-    def computeLowerBound(self, rectList) -> int:
-        area = 0
-        for rect in rectList:
-            area += rect.width * rect.height        
-        return int(area/(self.binWidth*self.binHeight) + 1) #ceiling
+    def computeLowerBound(self, rectList: List[Rect]) -> int:
+        # Use the total area cached on the instance if rectList holds all its items instead of summing the areas
+        if self.totalArea is not None and len(rectList) == self.numItems:
+            area = self.totalArea
+        else:
+            area = sum(rect.area for rect in rectList)
+        binArea = self.binWidth*self.binHeight
+        return max((area + binArea - 1)//binArea, 1) #ceiling
         
     
     def getLeastFilledBin(self) -> Bin:
         least = 2
         leastFilled = None
         for abin in self.binList:
-            if abin.getOccupancy() <= 0 or abin.getOccupancy() > 1:
+            occupancy = abin.getOccupancy()
+            if occupancy <= 0 or occupancy > 1:
                 raise RuntimeError("Wrong occupancy")
-            if abin.getOccupancy() < least:
-                least = abin.getOccupancy()
+            if occupancy < least:
+                least = occupancy
                 leastFilled = abin
         return leastFilled  
     
@@ -220,15 +272,13 @@ class RBPSolution:
         if len(subList) <= 2:
             return
             
-        strength = 0.025 + 0.125*rng.random()             
+        strength = 0.025 + 0.125*self.rng.random()             
         number = int(strength*len(subList) + 0.5)
         number = max(number, 1)
-        for _ in range(number):
-            idx1 = rng.randint(0, len(subList)-1)
-            idx2 = rng.randint(0, len(subList)-1)
-            while idx2 == idx1:
-                idx2 = rng.randint(0, len(subList)-1)
-            self.swap(subList, idx1, idx2)
+        # Draw 2*number distinct positions in one call and swap them pairwise (number <= n/2 for n > 2)
+        indices = self.rng.sample(range(len(subList)), 2*number)
+        for idx1, idx2 in zip(indices[:number], indices[number:]):
+            subList[idx1], subList[idx2] = subList[idx2], subList[idx1]
     
     def __repr__(self):
         st = ""